@@ -0,0 +1,199 @@
+"""
+An engine which advances a grid of cells by table lookups on blocks of cells,
+instead of counting the neighbors of every cell one at a time.
+
+The next state of the inner 2x2 cells of any 4x4 block only depends on the 16
+cells of that block. There are only 65,536 different 4x4 blocks, so the result
+for every one of them is worked out once for a rule and stored in a table.
+Advancing the field is then done by packing each 4x4 block into a 16 bit index
+and looking up its inner 2x2 result.
+
+Tables are cached on disk in the tables directory, one file per rule. If the
+directory can't be written, tables are only kept in memory.
+
+"""
+
+import os
+import tempfile
+
+import numpy
+
+from CellGrid import CellGrid, measure, parseRule
+
+
+# directory where computed tables are cached
+tableDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tables')
+
+# tables that have already been loaded, keyed by rule name
+tables = {}
+
+
+def ruleName(rule):
+    """
+    Given a rule in B/S notation, return a name for it that's the same for
+    every way of writing the rule, such as 'B3/S23', 'b3/s23' and '23/3'.
+
+    """
+
+    births, survivals = parseRule(rule)
+    return 'B%s_S%s' % (''.join(str(n) for n in sorted(births)),
+                        ''.join(str(n) for n in sorted(survivals)))
+
+def buildTable(rule):
+    """
+    Compute the table for a rule. Cell (i, j) of a 4x4 block, where i is the
+    column offset and j the row offset, is bit 4*i + j of its index. Cell
+    (i, j) of the inner 2x2 result is bit 2*i + j of the table entry.
+
+    """
+
+    births, survivals = parseRule(rule)
+
+    # unpack every possible index into a 4x4 block, indexed [index][col][row]
+    index = numpy.arange(1 << 16, dtype='uint32')
+    blocks = (index[:, numpy.newaxis] >> numpy.arange(16)) & 1
+    blocks = blocks.reshape((1 << 16, 4, 4))
+
+    table = numpy.zeros(1 << 16, dtype='uint8')
+    for i in range(2):
+        for j in range(2):
+            cell = blocks[:, i + 1, j + 1]
+            neighbors = blocks[:, i:i + 3, j:j + 3].sum(axis=(1, 2)) - cell
+            nextCell = numpy.where(cell == CellGrid.alive,
+                                   numpy.in1d(neighbors, list(survivals)),
+                                   numpy.in1d(neighbors, list(births)))
+            table |= nextCell.astype('uint8') << (2 * i + j)
+
+    return table
+
+def loadTable(rule):
+    """
+    Return the table for a rule, building it and caching it on disk if it
+    hasn't been built before.
+
+    """
+
+    name = ruleName(rule)
+    if name in tables:
+        return tables[name]
+
+    filename = os.path.join(tableDir, name + '.npy')
+    table = None
+    try:
+        if os.path.exists(filename):
+            table = numpy.load(filename)
+    except (IOError, OSError, ValueError):
+        # a broken cache file is rebuilt below
+        pass
+
+    if table is None or table.shape != (1 << 16,):
+        table = buildTable(rule)
+        try:
+            saveTable(table, filename)
+        except (IOError, OSError):
+            # can't cache it, keep it in memory only
+            pass
+
+    tables[name] = table
+    return table
+
+def saveTable(table, filename):
+    """
+    Save a table to the cache. It's written to a temporary file first and then
+    renamed, so other processes never load a partly written table.
+
+    """
+
+    if not os.path.isdir(tableDir):
+        try:
+            os.makedirs(tableDir)
+        except OSError:
+            # someone else may have just made it
+            if not os.path.isdir(tableDir):
+                raise
+
+    fd, tmpname = tempfile.mkstemp(suffix='.npy', dir=tableDir)
+    try:
+        fout = os.fdopen(fd, 'wb')
+        numpy.save(fout, table)
+        fout.close()
+        os.rename(tmpname, filename)
+    except:
+        os.remove(tmpname)
+        raise
+
+
+class BlockEngine:
+    """
+    Advances a copy of a CellGrid's field, using the rule the grid carries.
+
+    The field is kept with a border of dead cells around it, and is rounded up
+    to a whole number of 2x2 blocks, so every 2x2 block has a complete 4x4
+    block around it.
+
+    """
+
+    def __init__(self, grid):
+
+        self.xmin = grid.xmin
+        self.xmax = grid.xmax
+        self.ymin = grid.ymin
+        self.ymax = grid.ymax
+        self.ncols = grid.ncols
+        self.nrows = grid.nrows
+        self.rule = grid.rule
+        self.table = loadTable(grid.rule)
+
+        # number of 2x2 blocks in each direction
+        self.bcols = (self.ncols + 1) // 2
+        self.brows = (self.nrows + 1) // 2
+
+        self.field = numpy.zeros((2 * self.bcols + 2, 2 * self.brows + 2),
+                                 dtype='uint16')
+        self.field[1:self.ncols + 1, 1:self.nrows + 1] = grid.field
+
+        # buffers for the packed block indices, and for the previous field
+        self.index = numpy.zeros((self.bcols, self.brows), dtype='uint16')
+        self.previous = numpy.zeros_like(self.field)
+
+    def tick(self):
+        """
+        Advance the field by one generation. Returns the Metrics of the new
+        generation.
+
+        """
+
+        field = self.field
+        bcols = self.bcols
+        brows = self.brows
+        self.previous[...] = field
+
+        # pack every 4x4 block around a 2x2 block into its index
+        self.index[...] = 0
+        for i in range(4):
+            for j in range(4):
+                self.index |= (field[i:i + 2 * bcols:2, j:j + 2 * brows:2] <<
+                               (4 * i + j))
+
+        # look up the results and unpack them back into the field
+        result = self.table[self.index]
+        for i in range(2):
+            for j in range(2):
+                field[i + 1:i + 1 + 2 * bcols:2, j + 1:j + 1 + 2 * brows:2] = \
+                    (result >> (2 * i + j)) & 1
+
+        # cells beyond the bounds of the grid, from rounding up to whole
+        # blocks, must stay dead
+        field[self.ncols + 1:, :] = CellGrid.dead
+        field[:, self.nrows + 1:] = CellGrid.dead
+
+        # the border is at grid coordinate -1
+        return measure(self.previous, field, self.xmin - 1, self.ymin - 1)
+
+    def getGrid(self):
+        """Return the current state of the field as a CellGrid"""
+
+        bounds = (self.xmin, self.xmax, self.ymin, self.ymax)
+        grid = CellGrid(bounds, rule=self.rule)
+        grid.field[...] = self.field[1:self.ncols + 1, 1:self.nrows + 1]
+        return grid
@@ -0,0 +1,39 @@
+"""
+Load and write cell files in whichever format their file extension says.
+
+Each format is a module with load(filename) and write(grid, output) functions,
+registered under its file extension. Format modules are only imported the first
+time a file of that type is used.
+
+"""
+
+import importlib
+import os
+
+
+# names of the format modules, keyed by file extension
+formats = {
+    '.txt': 'MCellFile',
+    '.rle': 'RLECellFile',
+}
+
+
+def register(ext, moduleName):
+    """Register the module handling files with the given extension"""
+    formats[ext.lower()] = moduleName
+
+def getFormat(filename):
+    """Return the module handling the given file, importing it if needed"""
+
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in formats:
+        raise ValueError('unknown cell file type: %s' % filename)
+    return importlib.import_module(formats[ext])
+
+def load(filename):
+    """Load a cell file. Returns a CellGrid object."""
+    return getFormat(filename).load(filename)
+
+def write(grid, output):
+    """Write a grid to a cell file"""
+    getFormat(output).write(grid, output)
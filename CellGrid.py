@@ -4,8 +4,92 @@ Conway's Game of Life.
 
 """
 
+import collections
+
 import numpy
 
+from CellIndex import CellIndex
+
+# the rule of Conway's Game of Life, in B/S notation
+conwayRule = 'B3/S23'
+
+def parseRule(rule):
+    """
+    Parse a rule in B/S notation, such as 'B3/S23', or in the older S/B
+    notation, such as '23/3'. Returns a tuple of two frozensets, the neighbor
+    counts that cause a dead cell to be born and the neighbor counts that let
+    a live cell survive.
+
+    """
+
+    parts = rule.strip().upper().split('/')
+    if len(parts) != 2:
+        raise ValueError('not a B/S rule: %s' % rule)
+
+    if parts[0].startswith('B') or parts[1].startswith('S'):
+        births, survivals = parts
+    else:
+        survivals, births = parts
+    births = births.lstrip('B')
+    survivals = survivals.lstrip('S')
+
+    # neighbor counts can only go up to 8
+    for n in births + survivals:
+        if n not in '012345678':
+            raise ValueError('not a B/S rule: %s' % rule)
+
+    return (frozenset(int(n) for n in births),
+            frozenset(int(n) for n in survivals))
+
+# metrics of a generation. births and deaths are relative to the previous
+# generation. The bounding box of the live cells is in world coordinates, and
+# is all zeros when there are no live cells. activeArea is the area of the
+# bounding box of the cells that changed.
+Metrics = collections.namedtuple('Metrics', ['population', 'births', 'deaths',
+                                             'xmin', 'xmax', 'ymin', 'ymax',
+                                             'activeArea'])
+
+def boundingBox(mask):
+    """
+    Given a 2d boolean array, return the bounds of the set entries as
+    (<imin>, <imax>, <jmin>, <jmax>), or None if no entries are set.
+
+    """
+
+    cols = numpy.flatnonzero(mask.any(axis=1))
+    if len(cols) == 0:
+        return None
+    rows = numpy.flatnonzero(mask.any(axis=0))
+    return cols[0], cols[-1], rows[0], rows[-1]
+
+def measure(old, new, xmin=0, ymin=0):
+    """
+    Given the fields of two successive generations, return the Metrics of the
+    new one. xmin and ymin are the world coordinates of the first cell of the
+    fields.
+
+    """
+
+    alive = new == CellGrid.alive
+    changed = old != new
+
+    population = numpy.count_nonzero(alive)
+    births = numpy.count_nonzero(changed & alive)
+    deaths = numpy.count_nonzero(changed) - births
+
+    box = (0, 0, 0, 0)
+    live = boundingBox(alive)
+    if live is not None:
+        box = (live[0] + xmin, live[1] + xmin, live[2] + ymin, live[3] + ymin)
+
+    activeArea = 0
+    active = boundingBox(changed)
+    if active is not None:
+        activeArea = (active[1] - active[0] + 1) * (active[3] - active[2] + 1)
+
+    return Metrics(population, births, deaths, box[0], box[1], box[2], box[3],
+                   activeArea)
+
 class CellGrid:
     """
     A grid of cells
@@ -21,14 +105,17 @@ class CellGrid:
     dead = 0
     alive = 1
 
-    def __init__(self, bounds, liveCells=None):
+    def __init__(self, bounds, liveCells=None, rule=conwayRule):
         """
         bounds should have format (<xmin>, <xmax>, <ymin>, <ymax>).
         liveCells is a list of tuples of cell coordinates (col, row) in world
-        coordinates.
+        coordinates. rule is the rule used by tick(), in B/S notation.
         
         """
 
+        self.rule = rule
+        self.births, self.survivals = parseRule(rule)
+
         self.xmin = bounds[0]
         self.xmax = bounds[1]
         self.ymin = bounds[2]
@@ -36,6 +123,13 @@ class CellGrid:
         self.ncols = bounds[1] - bounds[0] + 1
         self.nrows = bounds[3] - bounds[2] + 1
 
+        # metrics of this generation, filled in by tick() or getMetrics()
+        self.metrics = None
+
+        # index of the live cells, built by getIndex() when first needed and
+        # kept up to date after that
+        self.index = None
+
         # create a representation of the grid as an array of ints,
         # array index is [col][row]
         # turn all cells off
@@ -76,6 +170,8 @@ class CellGrid:
 
         i, j = self.worldToGrid(col, row)
         self.field[i][j] = CellGrid.alive
+        if self.index is not None:
+            self.index.add(col, row)
 
     def cellOff(self, col, row):
         """
@@ -85,13 +181,19 @@ class CellGrid:
 
         i, j = self.worldToGrid(col, row)
         self.field[i][j] = CellGrid.dead
+        if self.index is not None:
+            self.index.remove(col, row)
 
     def tick(self):
         """Create the next generation. Returns a CellGrid."""
 
         # create a new grid with the same bounds
         bounds = (self.xmin, self.xmax, self.ymin, self.ymax)
-        newgrid = CellGrid(bounds)
+        newgrid = CellGrid(bounds, rule=self.rule)
+
+        # keys of the cells that are born and that die, for the index
+        born = []
+        died = []
 
         # populate new grid
         for col in range(self.ncols):
@@ -102,23 +204,91 @@ class CellGrid:
 
                 # check the rules
                 if self.field[col][row] == CellGrid.alive:
-                    if neighbors < 2:
-                        x, y = self.gridToWorld(col, row)
-                        newgrid.cellOff(x, y)
-                    elif neighbors >= 2 and neighbors <= 3:
+                    if neighbors in self.survivals:
                         x, y = self.gridToWorld(col, row)
                         newgrid.cellOn(x, y)
-                    elif neighbors > 3:
+                    else:
                         x, y = self.gridToWorld(col, row)
                         newgrid.cellOff(x, y)
+                        died.append(col * self.nrows + row)
                 else:
                     # cell is currently dead
-                    if neighbors == 3:
+                    if neighbors in self.births:
                         x, y = self.gridToWorld(col, row)
                         newgrid.cellOn(x, y)
+                        born.append(col * self.nrows + row)
+
+        newgrid.metrics = measure(self.field, newgrid.field,
+                                  self.xmin, self.ymin)
+        if self.index is not None:
+            newgrid.index = self.index.updated(
+                numpy.array(born, dtype='intp'),
+                numpy.array(died, dtype='intp'))
 
         return newgrid
 
+    def generations(self, start=0, stop=None, stride=1, history=1):
+        """
+        Lazily produce generations of this grid, without creating a new
+        CellGrid for every one. Yields a read-only GenerationView for
+        generations start, start + stride, ... up to but not including stop.
+        If stop is None, it never stops. Generation 0 is this grid.
+
+        The view of the latest generation reads the field being advanced
+        directly, nothing is copied when it's yielded. Only when the field is
+        about to be advanced is it copied, and only if history is more than
+        1, into a ring buffer of history - 1 fields that gets reused. A view
+        can be read while its generation is the latest or still in the
+        buffer, use its copy() method to keep it for longer. The metrics of
+        each view are always relative to the generation just before it, not
+        the previous view.
+
+        """
+
+        if start < 0:
+            raise ValueError('start must be 0 or more, not %i' % start)
+        if stride < 1:
+            raise ValueError('stride must be 1 or more, not %i' % stride)
+        if history < 1:
+            raise ValueError('history must be 1 or more, not %i' % history)
+
+        return self.generateViews(start, stop, stride, history)
+
+    def generateViews(self, start, stop, stride, history):
+        """The generator behind generations()"""
+
+        # BlockEngine imports CellGrid, so import it here
+        from BlockEngine import BlockEngine
+
+        engine = BlockEngine(self)
+        ring = History(history,
+                       engine.field[1:self.ncols + 1, 1:self.nrows + 1])
+        generation = 0
+        metrics = self.getMetrics()
+        while stop is None or generation < stop:
+            if generation >= start and (generation - start) % stride == 0:
+                ring.show(generation)
+                yield GenerationView(self, generation, metrics, ring)
+
+            if stop is not None and generation + 1 >= stop:
+                break
+
+            ring.advance()
+            metrics = engine.tick()
+            generation += 1
+
+    def getMetrics(self):
+        """
+        Return the Metrics of this generation. For a grid that wasn't made by
+        tick(), there are no births or deaths.
+
+        """
+
+        if self.metrics is None:
+            self.metrics = measure(self.field, self.field,
+                                   self.xmin, self.ymin)
+        return self.metrics
+
     def getNumNeighbors(self, col, row):
         """
         Given the coordinates of a cell in grid space, return the number of
@@ -148,13 +318,14 @@ class CellGrid:
 
         """
 
-        liveCells = []
-        for col in range(self.ncols):
-            for row in range(self.nrows):
-                if self.field[col][row] == CellGrid.alive:
-                    liveCells.append(self.gridToWorld(col, row))
+        return list(self.getIndex())
+
+    def getIndex(self):
+        """Return the CellIndex of the live cells"""
 
-        return liveCells
+        if self.index is None:
+            self.index = CellIndex(self)
+        return self.index
 
     def printField(self):
         """
@@ -174,3 +345,114 @@ class CellGrid:
 
             # make sure to remove the rightmost space before printing
             print s.rstrip()
+
+class History:
+    """
+    The fields of the most recent generations shown by generations(). The
+    latest one is the live field being advanced, the ones before it are
+    copies kept in a ring buffer of size - 1 arrays, allocated once and
+    overwritten as new generations come in.
+
+    """
+
+    def __init__(self, size, live):
+
+        self.live = live
+        self.liveGeneration = None
+
+        shape = live.shape
+        self.fields = [numpy.zeros(shape, dtype='int')
+                       for _ in range(size - 1)]
+        self.generations = [None] * (size - 1)
+        self.next = 0
+
+    def show(self, generation):
+        """The live field now holds the given generation"""
+        self.liveGeneration = generation
+
+    def advance(self):
+        """
+        The live field is about to change. Keep a copy of the generation it
+        shows, if there's room for one.
+
+        """
+
+        if self.liveGeneration is not None and len(self.fields) > 0:
+            slot = self.next
+            self.fields[slot][...] = self.live
+            self.generations[slot] = self.liveGeneration
+            self.next = (slot + 1) % len(self.fields)
+        self.liveGeneration = None
+
+    def get(self, generation):
+        """Return a read-only field of a generation if it's still kept"""
+
+        if generation == self.liveGeneration:
+            field = self.live.view()
+        elif generation in self.generations:
+            field = self.fields[self.generations.index(generation)].view()
+        else:
+            raise LookupError('generation %i is no longer in the history' %
+                              generation)
+
+        field.flags.writeable = False
+        return field
+
+class GenerationView:
+    """
+    A read-only view of one generation of a grid, as produced by
+    CellGrid.generations(). Has the same attributes and read methods as a
+    CellGrid. Reading the field fails once the generation has dropped out of
+    the history, copy() returns a CellGrid that can be kept.
+
+    """
+
+    def __init__(self, grid, generation, metrics, history):
+
+        self.generation = generation
+        self.metrics = metrics
+        self.rule = grid.rule
+        self.xmin = grid.xmin
+        self.xmax = grid.xmax
+        self.ymin = grid.ymin
+        self.ymax = grid.ymax
+        self.ncols = grid.ncols
+        self.nrows = grid.nrows
+        self.history = history
+
+        # built from the field the first time it's needed
+        self.index = None
+
+    @property
+    def field(self):
+        return self.history.get(self.generation)
+
+    def worldToGrid(self, col, row):
+        return col - self.xmin, row - self.ymin
+
+    def gridToWorld(self, col, row):
+        return col + self.xmin, row + self.ymin
+
+    def getLiveCells(self):
+        """
+        Return all live cells as a list of cell coordinates in world
+        coordinates.
+
+        """
+
+        return list(self.getIndex())
+
+    def getIndex(self):
+        """Return the CellIndex of the live cells"""
+
+        if self.index is None:
+            self.index = CellIndex(self)
+        return self.index
+
+    def copy(self):
+        """Return a CellGrid with the state of this generation"""
+
+        bounds = (self.xmin, self.xmax, self.ymin, self.ymax)
+        grid = CellGrid(bounds, rule=self.rule)
+        grid.field[...] = self.field
+        return grid
@@ -7,9 +7,15 @@ Cell (0, 0) is the first one on the bottom left, coords are (<xpos>, <ypos>).
 Cell coordinates can be negative. Each cell has width and height of 1. So cell
 (0, 0) has world coordinates (0, 0) and (1, 1).
 
+usage: <cell file>
+       --connect <address> <simulation>
+
+With --connect, the viewer renders a simulation owned by a SimulationServer
+instead of loading its own grid. See SimulationServer for address formats.
 
 """
 
+import json
 import math
 import os
 import sys
@@ -21,8 +27,8 @@ from PyQt4 import QtGui
 from PyQt4.QtOpenGL import *
 
 from CellGrid import CellGrid
-import MCellFile
-import RLECellFile
+import CellFile
+from Timeline import Timeline
 
 
 # cell size in pixels
@@ -36,6 +42,18 @@ gridLineWidth = 2
 
 anti_alias = True
 
+iconDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'icons')
+
+# icons that have already been loaded, keyed by name
+icons = {}
+
+def getIcon(name):
+    """Return the icon with the given name from the icons directory"""
+
+    if name not in icons:
+        icons[name] = QtGui.QIcon(os.path.join(iconDir, name + '.ico'))
+    return icons[name]
+
 class CellGridViewerWidget(QGLWidget):
 
     def __init__(self, parent):
@@ -52,6 +70,20 @@ class CellGridViewerWidget(QGLWidget):
 
         self.showGrid = True
 
+        # report the cell under the mouse even when no button is pressed
+        self.setMouseTracking(True)
+
+    def mouseMoveEvent(self, event):
+        """Emits cellHovered with the world coordinates of the cell"""
+
+        ncols = self.xmax - self.xmin + 1
+        nrows = self.ymax - self.ymin + 1
+        x = self.xmin + int(math.floor(
+            float(event.x()) * ncols / self.width()))
+        y = self.ymin + int(math.floor(
+            float(self.height() - event.y()) * nrows / self.height()))
+        self.emit(QtCore.SIGNAL('cellHovered(int, int)'), x, y)
+
     def paintGL(self):
 
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
@@ -148,22 +180,43 @@ class CellGridViewerMainWindow(QtGui.QMainWindow):
         QtGui.QMainWindow.__init__(self)
         self.initUI()
         self.grid = None
+        self.generation = 0
+
+        # every generation of the loaded grid, for stepping back
+        self.timeline = None
+
+        # the cell the mouse is over, in world coordinates
+        self.hoverCell = None
+
+        # when connected to a simulation server, the socket, the name of the
+        # simulation, and the set of live cells built up from its stream
+        self.socket = None
+        self.simName = None
+        self.remoteCells = set()
 
     def initUI(self):
 
-        open_icon = os.path.join(os.path.dirname(__file__), 'icons/open.ico')
-        openFile = QtGui.QAction(QtGui.QIcon(open_icon), "Load File", self)
+        openFile = QtGui.QAction(getIcon('open'), "Load File", self)
         openFile.setShortcut("Ctrl+O")
         openFile.setStatusTip('Load File')
         self.connect(openFile, QtCore.SIGNAL('triggered()'), self.onOpen)
 
-        tick_icon = os.path.join(os.path.dirname(__file__), 'icons/tick.ico')
-        tick = QtGui.QAction(QtGui.QIcon(tick_icon), "Tick", self)
+        tick = QtGui.QAction(getIcon('tick'), "Tick", self)
         tick.setStatusTip('Tick')
         self.connect(tick, QtCore.SIGNAL('triggered()'), self.onTick)
 
-        exit_icon = os.path.join(os.path.dirname(__file__), 'icons/close.ico')
-        exit = QtGui.QAction(QtGui.QIcon(exit_icon), "Exit", self)
+        back = QtGui.QAction("Back", self)
+        back.setShortcut("Ctrl+Z")
+        back.setStatusTip('Go back one generation')
+        self.connect(back, QtCore.SIGNAL('triggered()'), self.onBack)
+
+        self.play = QtGui.QAction("Run", self)
+        self.play.setCheckable(True)
+        self.play.setStatusTip('Run or pause the simulation on the server')
+        self.play.setVisible(False)
+        self.connect(self.play, QtCore.SIGNAL('toggled(bool)'), self.onPlay)
+
+        exit = QtGui.QAction(getIcon('close'), "Exit", self)
         exit.setShortcut("Ctrl+Q")
         exit.setStatusTip('Exit application')
         self.connect(exit, QtCore.SIGNAL('triggered()'), QtCore.SLOT('close()'))
@@ -173,16 +226,32 @@ class CellGridViewerMainWindow(QtGui.QMainWindow):
         menubar = self.menuBar()
         fileMenu = menubar.addMenu('&File')
         fileMenu.addAction(openFile)
+        fileMenu.addAction(back)
         fileMenu.addAction(tick)
+        fileMenu.addAction(self.play)
         fileMenu.addAction(exit)
 
         toolbar = self.addToolBar('Exit')
         toolbar.addAction(openFile)
+        toolbar.addAction(back)
         toolbar.addAction(tick)
+        toolbar.addAction(self.play)
         toolbar.addAction(exit)
 
+        # scrub bar over the recorded generations
+        self.scrubBar = QtGui.QSlider(QtCore.Qt.Horizontal, self)
+        self.scrubBar.setRange(0, 0)
+        self.scrubBar.setEnabled(False)
+        self.scrubBar.setStatusTip('Go to a recorded generation')
+        self.connect(self.scrubBar, QtCore.SIGNAL('valueChanged(int)'),
+                     self.showGeneration)
+        timelineBar = self.addToolBar('Timeline')
+        timelineBar.addWidget(self.scrubBar)
+
         self.viewer = CellGridViewerWidget(self)
         self.setCentralWidget(self.viewer)
+        self.connect(self.viewer, QtCore.SIGNAL('cellHovered(int, int)'),
+                     self.onHover)
 
         self.statusBar()
 
@@ -201,28 +270,84 @@ class CellGridViewerMainWindow(QtGui.QMainWindow):
 
         self.tick()
 
+    def onBack(self):
+        """Triggered when going back a generation"""
+
+        if self.timeline is not None and self.generation > 0:
+            self.showGeneration(self.generation - 1)
+
+    def onHover(self, x, y):
+        """Triggered when the mouse moves over a cell"""
+
+        self.hoverCell = (x, y)
+        self.updateStatusBar()
+
+    def onPlay(self, running):
+        """Triggered when toggling run/pause in client mode"""
+
+        if running:
+            self.sendCommand('run')
+        else:
+            self.sendCommand('pause')
+
     def tick(self):
         """Generate the next generation"""
 
+        if self.socket is not None:
+            self.sendCommand('step')
+            return
+
         if self.grid is None:
             return
 
+        # after going back, replay the recorded generations
+        if self.generation < len(self.timeline) - 1:
+            self.showGeneration(self.generation + 1)
+            return
+
         self.grid = self.grid.tick()
+        self.generation += 1
+        self.timeline.append(self.grid)
+        self.updateScrubBar()
+
         grid = self.grid
         self.viewer.setGridView(grid.xmin, grid.xmax, grid.ymin, grid.ymax)
         self.viewer.setLiveCells(grid.getLiveCells())
         self.viewer.update()
         self.updateStatusBar()
 
+    def showGeneration(self, generation):
+        """Show a recorded generation"""
+
+        if self.timeline is None or generation == self.generation:
+            return
+
+        self.grid = self.timeline.getGrid(generation)
+        self.generation = generation
+        self.updateScrubBar()
+
+        self.viewer.setLiveCells(self.grid.getLiveCells())
+        self.viewer.update()
+        self.updateStatusBar()
+
+    def updateScrubBar(self):
+        """Make the scrub bar match the timeline and current generation"""
+
+        # don't trigger showGeneration while moving the scrub bar
+        self.scrubBar.blockSignals(True)
+        self.scrubBar.setEnabled(True)
+        self.scrubBar.setRange(0, len(self.timeline) - 1)
+        self.scrubBar.setValue(self.generation)
+        self.scrubBar.blockSignals(False)
+
     def loadCellFile(self, filename):
         """Load a cell file"""
 
-        # look at file extension to see what type of file it is
-        ext = os.path.splitext(filename)[1]
-        if ext == '.txt':
-            self.grid = MCellFile.load(filename)
-        elif ext == '.rle':
-            self.grid = RLECellFile.load(filename)
+        # the file extension says what type of file it is
+        self.grid = CellFile.load(filename)
+        self.generation = 0
+        self.timeline = Timeline(self.grid)
+        self.updateScrubBar()
 
         grid = self.grid
         self.viewer.setGridView(grid.xmin, grid.xmax, grid.ymin, grid.ymax)
@@ -231,6 +356,65 @@ class CellGridViewerMainWindow(QtGui.QMainWindow):
         self.centerOnScreen()
         self.updateStatusBar()
 
+    def connectToServer(self, address, simName):
+        """
+        Render a simulation owned by a simulation server rather than a local
+        grid. The address has the same format as for SimulationServer.
+
+        """
+
+        # only needed in client mode, so imported here
+        from PyQt4 import QtNetwork
+        from SimulationServer import parseAddress
+
+        address = parseAddress(address)
+        if isinstance(address, tuple):
+            self.socket = QtNetwork.QTcpSocket(self)
+            self.socket.connectToHost(address[0], address[1])
+        else:
+            self.socket = QtNetwork.QLocalSocket(self)
+            self.socket.connectToServer(address)
+        self.connect(self.socket, QtCore.SIGNAL('readyRead()'),
+                     self.onServerMessage)
+
+        self.simName = simName
+        self.play.setVisible(True)
+        self.sendCommand('subscribe')
+
+    def sendCommand(self, cmd):
+        """Send a command about our simulation to the server"""
+
+        message = {'cmd': cmd, 'sim': self.simName}
+        self.socket.write(json.dumps(message) + '\n')
+
+    def onServerMessage(self):
+        """Triggered when the server has sent something"""
+
+        from SimulationServer import pairs
+
+        while self.socket.canReadLine():
+            message = json.loads(str(self.socket.readLine()))
+            if 'generation' in message:
+                self.generation = message['generation']
+
+            if message['type'] == 'snapshot':
+                self.remoteCells = set(pairs(message['cells']))
+                self.viewer.setGridView(*message['bounds'])
+                self.resize()
+                self.centerOnScreen()
+            elif message['type'] == 'delta':
+                self.remoteCells.difference_update(pairs(message['deaths']))
+                self.remoteCells.update(pairs(message['births']))
+            elif message['type'] == 'error':
+                self.statusBar().showMessage(message['message'])
+                continue
+            else:
+                continue
+
+            self.viewer.setLiveCells(list(self.remoteCells))
+            self.viewer.update()
+            self.updateStatusBar()
+
     def resize(self):
         """Recalculate the window size. Make sure aspect ratio is maintained
         such that the cells look square.
@@ -252,8 +436,27 @@ class CellGridViewerMainWindow(QtGui.QMainWindow):
         xmax = self.viewer.xmax
         ymin = self.viewer.ymin
         ymax = self.viewer.ymax
-        self.statusBar().showMessage('bounds:  (%i, %i) to (%i, %i)' % 
-                                     (xmin, ymin, xmax, ymax))
+        message = 'bounds:  (%i, %i) to (%i, %i)' % (xmin, ymin, xmax, ymax)
+        message += '    generation: %i' % self.generation
+
+        if self.grid is not None:
+            m = self.grid.getMetrics()
+            message += '    population: %i    births: %i    deaths: %i' % (
+                m.population, m.births, m.deaths)
+            message += '    box: (%i, %i) to (%i, %i)' % (m.xmin, m.ymin,
+                                                         m.xmax, m.ymax)
+            message += '    active area: %i' % m.activeArea
+
+        if self.hoverCell is not None:
+            x, y = self.hoverCell
+            if self.grid is not None:
+                alive = self.grid.getIndex().contains(x, y)
+            else:
+                alive = self.hoverCell in self.remoteCells
+            message += '    cell (%i, %i): %s' % (x, y,
+                                                 'alive' if alive else 'dead')
+
+        self.statusBar().showMessage(message)
 
     def centerOnScreen (self):
         """Center the window on the screen"""
@@ -278,7 +481,9 @@ class CellGridViewerMainWindow(QtGui.QMainWindow):
 if __name__ == '__main__':
     app = QtGui.QApplication(['Game of Life'])
     window = CellGridViewerMainWindow()
-    if len(sys.argv) >= 2:
+    if len(sys.argv) >= 4 and sys.argv[1] == '--connect':
+        window.connectToServer(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) >= 2:
         window.loadCellFile(sys.argv[1])
     window.show()
     sys.exit(app.exec_())
@@ -0,0 +1,123 @@
+"""
+An index of the live cells of a grid, for looking up cells without scanning
+the whole field.
+
+Each live cell is stored as a key, col * nrows + row in grid coordinates, in a
+sorted array. Cells of a column are next to each other and sorted by row, so a
+rectangle is looked up with two binary searches per column, and a point with a
+single one. Iterating over the live cells only takes time proportional to the
+population.
+
+"""
+
+import numpy
+
+
+class CellIndex:
+    """
+    A sorted array of the keys of the live cells of a grid. Takes anything
+    with the bounds and field of a CellGrid.
+
+    """
+
+    def __init__(self, grid, keys=None):
+
+        self.xmin = grid.xmin
+        self.ymin = grid.ymin
+        self.ncols = grid.ncols
+        self.nrows = grid.nrows
+
+        if keys is None:
+            keys = numpy.flatnonzero(grid.field)
+        self.keys = keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        return iter(self.cells(self.keys))
+
+    def cells(self, keys):
+        """Turn an array of keys into a list of cells in world coordinates"""
+
+        cols = keys // self.nrows + self.xmin
+        rows = keys % self.nrows + self.ymin
+        return zip(cols.tolist(), rows.tolist())
+
+    def key(self, col, row):
+        """
+        Return the key of a cell given in world coordinates, or None if it's
+        outside the grid.
+
+        """
+
+        i = col - self.xmin
+        j = row - self.ymin
+        if i < 0 or i >= self.ncols or j < 0 or j >= self.nrows:
+            return None
+        return i * self.nrows + j
+
+    def contains(self, col, row):
+        """Return whether the cell at the given world coordinates is alive"""
+
+        key = self.key(col, row)
+        if key is None:
+            return False
+
+        pos = numpy.searchsorted(self.keys, key)
+        return pos < len(self.keys) and self.keys[pos] == key
+
+    def query(self, xmin, xmax, ymin, ymax):
+        """
+        Return a list of the live cells inside a rectangle, bounds are world
+        coordinates and inclusive.
+
+        """
+
+        # clip the rectangle to the grid, in grid coordinates
+        c0 = max(xmin - self.xmin, 0)
+        c1 = min(xmax - self.xmin, self.ncols - 1)
+        r0 = max(ymin - self.ymin, 0)
+        r1 = min(ymax - self.ymin, self.nrows - 1)
+        if c0 > c1 or r0 > r1:
+            return []
+
+        # the range of keys in each column
+        cols = numpy.arange(c0, c1 + 1) * self.nrows
+        lo = numpy.searchsorted(self.keys, cols + r0)
+        hi = numpy.searchsorted(self.keys, cols + r1, side='right')
+
+        # gather all the ranges into a single array of positions
+        counts = hi - lo
+        starts = numpy.repeat(lo - numpy.cumsum(counts) + counts, counts)
+        positions = starts + numpy.arange(counts.sum())
+
+        return self.cells(self.keys[positions])
+
+    def updated(self, births, deaths):
+        """
+        Return a new index with the given sorted arrays of keys born and
+        died. Takes time proportional to the population and the number of
+        changes, not to the size of the grid.
+
+        """
+
+        keys = numpy.delete(self.keys, numpy.searchsorted(self.keys, deaths))
+        keys = numpy.insert(keys, numpy.searchsorted(keys, births), births)
+        return CellIndex(self, keys)
+
+    def add(self, col, row):
+        """Add a single live cell, given in world coordinates"""
+
+        key = self.key(col, row)
+        pos = numpy.searchsorted(self.keys, key)
+        if pos == len(self.keys) or self.keys[pos] != key:
+            self.keys = numpy.insert(self.keys, pos, key)
+
+    def remove(self, col, row):
+        """Remove a single live cell, given in world coordinates"""
+
+        key = self.key(col, row)
+        pos = numpy.searchsorted(self.keys, key)
+        if pos < len(self.keys) and self.keys[pos] == key:
+            self.keys = numpy.delete(self.keys, pos)
@@ -0,0 +1,83 @@
+"""
+A time-series of the metrics of every generation of a simulation, such as the
+population and the number of births and deaths.
+
+The metrics are stored in numpy columns which are allocated up front, and can
+be written out as a CSV file or as a binary columnar .npz file.
+
+"""
+
+import os
+
+import numpy
+
+from CellGrid import Metrics
+
+
+class GenerationStats:
+    """The Metrics of a sequence of generations, one numpy column per field"""
+
+    columns = ('generation',) + Metrics._fields
+
+    def __init__(self, capacity=1024):
+        """
+        capacity is the number of generations to allocate room for. More room
+        is allocated when it runs out.
+
+        """
+
+        self.size = 0
+        self.data = {}
+        for name in GenerationStats.columns:
+            self.data[name] = numpy.zeros(capacity, dtype='int64')
+
+    def record(self, generation, metrics):
+        """Add the Metrics of a generation"""
+
+        if self.size == len(self.data['generation']):
+            for name in GenerationStats.columns:
+                self.data[name] = numpy.resize(self.data[name],
+                                               max(1, 2 * self.size))
+
+        self.data['generation'][self.size] = generation
+        for name, value in zip(Metrics._fields, metrics):
+            self.data[name][self.size] = value
+        self.size += 1
+
+    def column(self, name):
+        """Return the recorded values of a column"""
+        return self.data[name][:self.size]
+
+    def write(self, filename):
+        """Write the stats to a file, format depends on the file extension"""
+        self.getWriter(filename)(filename)
+
+    def getWriter(self, filename):
+        """
+        Return the method that writes the stats in the format of the given
+        file. Raises ValueError for an unknown file type, so a bad filename
+        can be caught before running a simulation.
+
+        """
+
+        ext = os.path.splitext(filename)[1]
+        if ext == '.csv':
+            return self.writeCSV
+        elif ext == '.npz':
+            return self.writeColumns
+        raise ValueError('unknown stats file type: %s' % filename)
+
+    def writeCSV(self, filename):
+        """Write the stats as a CSV file, with a header line"""
+
+        table = numpy.column_stack([self.column(name)
+                                    for name in GenerationStats.columns])
+        numpy.savetxt(filename, table, fmt='%d', delimiter=',',
+                      header=','.join(GenerationStats.columns), comments='')
+
+    def writeColumns(self, filename):
+        """Write the stats as a .npz file, with one array per column"""
+
+        columns = dict((name, self.column(name))
+                       for name in GenerationStats.columns)
+        numpy.savez(filename, **columns)
@@ -49,11 +49,8 @@ def write(grid, output):
     fout.write('\n')
 
     fout.write('# live cells, specified by <column> <row>\n')
-    for i in range(grid.ncols):
-        for j in range(grid.nrows):
-            if grid.field[i][j] == CellGrid.alive:
-                x, y = grid.gridToWorld(i, j)
-                fout.write('%i %i\n' % (x, y))
+    for x, y in grid.getIndex():
+        fout.write('%i %i\n' % (x, y))
 
     fout.close()
 
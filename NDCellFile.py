@@ -0,0 +1,76 @@
+"""
+Functions to read and write cell files with any number of dimensions.
+
+The format is the same as the MCell format, but with a pair of bounds per axis,
+an optional 'rule <rule>' line after the bounds, and a coordinate per axis for
+each live cell. MCell files can be loaded as they are, as 2D grids.
+
+"""
+
+import numpy
+
+from CellGrid import conwayRule
+from NDCellGrid import NDCellGrid
+
+
+def load(filename):
+    """
+    Load a cell file in the n-dimensional format. Returns an NDCellGrid
+    object.
+
+    """
+
+    bounds = None
+    rule = None
+    liveCells = []
+    fin = open(filename, 'r')
+    for line in fin:
+        line2 = line.split()
+        if len(line2) == 0 or line2[0][0] == '#':
+            continue
+
+        # if haven't read bounds of grid yet, then read it in
+        if bounds is None:
+            bounds = [int(x) for x in line2]
+            continue
+
+        if line2[0] == 'rule':
+            rule = line2[1]
+            continue
+
+        liveCells.append(tuple(int(x) for x in line2))
+
+    fin.close()
+
+    if bounds is None:
+        raise ValueError('no bounds line in cell file: %s' % filename)
+
+    if rule is None:
+        # MCell files are 2D Life
+        if len(bounds) == 4:
+            rule = conwayRule
+        else:
+            rule = '4555'
+
+    return NDCellGrid(bounds, liveCells, rule)
+
+def write(grid, output):
+    """
+    Given a grid and an output filename, write the current state of the grid
+    to the file, in the n-dimensional format.
+
+    """
+
+    fout = open(output, 'w')
+    fout.write('# grid view bounds, in terms of cell coordinates\n')
+    fout.write('# format: <min> <max> for each axis\n')
+    fout.write(' '.join('%i' % x for x in grid.bounds()) + '\n')
+    fout.write('rule %s\n' % grid.rule)
+
+    fout.write('\n')
+
+    fout.write('# live cells, specified by a coordinate for each axis\n')
+    cells = numpy.argwhere(grid.field) + grid.mins
+    numpy.savetxt(fout, cells, fmt='%i')
+
+    fout.close()
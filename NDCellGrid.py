@@ -0,0 +1,183 @@
+"""
+A grid of cells with any number of dimensions, such as 3D Life.
+
+Every cell has a Moore neighborhood of 3^d - 1 neighbors in d dimensions. The
+neighbors of all cells are counted at once: summing each cell with its two
+neighbors along one axis, and then doing the same for every other axis, sums
+the whole 3^d block around every cell.
+
+Rules are written in Bays' notation, <El><Eu><Fl><Fu>, where a live cell
+survives with El to Eu neighbors and a dead cell is born with Fl to Fu
+neighbors, such as 4555 and 5766 for 3D. Use commas for counts of 10 or more,
+like 4,5,5,5. Rules in B/S notation, like B3/S23, also work.
+
+"""
+
+import numpy
+
+from CellGrid import parseRule
+
+
+def parseNDRule(rule):
+    """
+    Parse a rule in Bays' notation or in B/S notation. Returns a tuple of two
+    frozensets, the neighbor counts that cause a dead cell to be born and the
+    neighbor counts that let a live cell survive.
+
+    """
+
+    if '/' in rule:
+        return parseRule(rule)
+
+    if ',' in rule:
+        parts = rule.split(',')
+    else:
+        parts = list(rule.strip())
+    if len(parts) != 4:
+        raise ValueError('not a rule in Bays notation: %s' % rule)
+
+    el, eu, fl, fu = [int(n) for n in parts]
+    return frozenset(range(fl, fu + 1)), frozenset(range(el, eu + 1))
+
+def axisSlice(ndim, axis, start, stop):
+    """Return an index that slices start:stop along one axis only"""
+
+    index = [slice(None)] * ndim
+    index[axis] = slice(start, stop)
+    return tuple(index)
+
+
+class NDCellGrid:
+    """
+    A grid of cells in any number of dimensions.
+
+    Same as CellGrid, but cell coordinates are tuples with one value per axis,
+    and the field is indexed by those tuples.
+
+    """
+
+    # possible states of each cell
+    dead = 0
+    alive = 1
+
+    def __init__(self, bounds, liveCells=None, rule='4555'):
+        """
+        bounds should have format (<min 0>, <max 0>, <min 1>, <max 1>, ...),
+        with a pair of bounds per axis. liveCells is a list of tuples of cell
+        coordinates in world coordinates.
+
+        """
+
+        self.rule = rule
+        self.births, self.survivals = parseNDRule(rule)
+
+        self.ndim = len(bounds) // 2
+        self.mins = tuple(bounds[0::2])
+        self.maxs = tuple(bounds[1::2])
+        self.shape = tuple(hi - lo + 1 for lo, hi in zip(self.mins, self.maxs))
+
+        # one byte per cell, and for neighbor counts as long as they fit
+        self.field = numpy.zeros(self.shape, dtype='uint8')
+        self.countType = 'uint8'
+        if 3 ** self.ndim > 256:
+            self.countType = 'uint16'
+
+        if liveCells:
+            cells = numpy.array(liveCells) - self.mins
+            self.field[tuple(cells.T)] = NDCellGrid.alive
+
+    def bounds(self):
+        """Return the bounds in the format given to the constructor"""
+
+        bounds = []
+        for lo, hi in zip(self.mins, self.maxs):
+            bounds.extend([lo, hi])
+        return bounds
+
+    def worldToGrid(self, cell):
+        """Given a cell in world coordinates, return it in grid coordinates"""
+        return tuple(c - lo for c, lo in zip(cell, self.mins))
+
+    def gridToWorld(self, cell):
+        """Given a cell in grid coordinates, return it in world coordinates"""
+        return tuple(c + lo for c, lo in zip(cell, self.mins))
+
+    def cellOn(self, cell):
+        """Make the cell alive. Takes world coordinates."""
+        self.field[self.worldToGrid(cell)] = NDCellGrid.alive
+
+    def cellOff(self, cell):
+        """Make the cell dead. Takes world coordinates."""
+        self.field[self.worldToGrid(cell)] = NDCellGrid.dead
+
+    def getNumNeighbors(self):
+        """
+        Return an array the shape of the field with the number of alive
+        neighbors of every cell.
+
+        """
+
+        counts = self.field.astype(self.countType)
+        shifted = numpy.empty_like(counts)
+        for axis in range(self.ndim):
+            n = self.shape[axis]
+            shifted[...] = counts
+            counts[axisSlice(self.ndim, axis, 1, n)] += \
+                shifted[axisSlice(self.ndim, axis, 0, n - 1)]
+            counts[axisSlice(self.ndim, axis, 0, n - 1)] += \
+                shifted[axisSlice(self.ndim, axis, 1, n)]
+
+        # the block around each cell includes the cell itself
+        counts -= self.field
+        return counts
+
+    def tick(self):
+        """Create the next generation. Returns an NDCellGrid."""
+
+        counts = self.getNumNeighbors()
+
+        newgrid = NDCellGrid(self.bounds(), rule=self.rule)
+        result = newgrid.field.view('bool')
+        match = numpy.empty(self.shape, dtype='bool')
+
+        # live cells that survive
+        state = self.field.astype('bool')
+        for n in self.survivals:
+            numpy.equal(counts, n, out=match)
+            match &= state
+            result |= match
+
+        # dead cells that are born
+        numpy.logical_not(state, out=state)
+        for n in self.births:
+            numpy.equal(counts, n, out=match)
+            match &= state
+            result |= match
+
+        return newgrid
+
+    def generations(self, stop=None):
+        """
+        Yield this grid and the generations after it, up to but not including
+        generation stop. If stop is None, it never stops.
+
+        """
+
+        grid = self
+        generation = 0
+        while stop is None or generation < stop:
+            yield grid
+            if stop is not None and generation + 1 >= stop:
+                break
+            grid = grid.tick()
+            generation += 1
+
+    def getLiveCells(self):
+        """
+        Return all live cells as a list of cell coordinates in world
+        coordinates.
+
+        """
+
+        cells = numpy.argwhere(self.field) + self.mins
+        return [tuple(cell) for cell in cells.tolist()]
@@ -3,7 +3,9 @@ Functions to read and write files in Golly's extended RLE file format.
 
 """
 
-from CellGrid import CellGrid
+import numpy
+
+from CellGrid import CellGrid, conwayRule, parseRule
 
 def load(filename):
     """Load a file in the extended RLE file format as used by Golly"""
@@ -13,6 +15,7 @@ def load(filename):
     upper_left = [0, 0]
     width = 0
     height = 0
+    rule = conwayRule
 
     fin = open(filename, 'r')
 
@@ -39,7 +42,8 @@ def load(filename):
         header_parts = line.split(',')
         xpart = header_parts[0]
         ypart = header_parts[1]
-        rule = ','.join(header_parts[2:])
+        if len(header_parts) > 2:
+            rule = getRule(','.join(header_parts[2:]))
         width = int(xpart.split('=')[1])
         height = int(ypart.split('=')[1])
         first_line_found = True
@@ -92,6 +96,7 @@ def load(filename):
                 for _ in range(multiplier):
                     y -= 1
                 x = upper_left[0]
+                multiplier = 1
                 i += 1
                 if i >= len(line):
                     continue
@@ -104,11 +109,72 @@ def load(filename):
     # format: xmin, xmax, ymin, ymax
     bounds = [upper_left[0], upper_left[0] + width - 1,
               upper_left[1] - height + 1, upper_left[1]]
-    return CellGrid(bounds, liveCells)
+    return CellGrid(bounds, liveCells, rule)
+
+def getRule(part):
+    """
+    Given the rule part of a header line, such as 'rule = B3/S23:T0,68',
+    return the rule in B/S notation. Any topology suffix is ignored, and
+    rules that aren't B/S rules, like LifeHistory, fall back to Conway's rule.
+
+    """
+
+    rule = part.split('=', 1)[-1].split(':')[0].strip()
+    try:
+        parseRule(rule)
+    except ValueError:
+        return conwayRule
+    return rule
+
+def write(grid, output):
+    """
+    Given a grid and an output filename, write the current state of the grid
+    to the file in the extended RLE file format, with the position of its
+    upper left cell and its rule.
+
+    """
+
+    # runs of cells as (count, tag) pairs, from the top row down
+    runs = []
+    done = 0
+    for k in range(grid.nrows):
+        row = grid.field[:, grid.nrows - 1 - k] == CellGrid.alive
+        if not row.any():
+            continue
 
-def write():
-    """To be written"""
-    # TODO: write this
-    pass
+        # end the rows before this one, including any blank rows
+        if k > done:
+            runs.append((k - done, '$'))
+            done = k
+
+        # dead cells at the end of a row are left out
+        length = numpy.flatnonzero(row)[-1] + 1
+        row = row[:length]
+        edges = (numpy.flatnonzero(row[1:] != row[:-1]) + 1).tolist()
+        for start, stop in zip([0] + edges, edges + [length]):
+            if row[start]:
+                runs.append((stop - start, 'o'))
+            else:
+                runs.append((stop - start, 'b'))
+    runs.append((1, '!'))
+
+    fout = open(output, 'w')
+    fout.write('#CXRLE Pos=%i,%i\n' % (grid.xmin, grid.ymax))
+    fout.write('x = %i, y = %i, rule = %s\n' % (grid.ncols, grid.nrows,
+                                                grid.rule))
+
+    # lines are kept to 70 characters, without splitting a run
+    line = ''
+    for count, tag in runs:
+        run = tag
+        if count > 1:
+            run = str(count) + tag
+        if len(line) + len(run) > 70:
+            fout.write(line + '\n')
+            line = ''
+        line += run
+    fout.write(line + '\n')
+
+    fout.close()
 
 
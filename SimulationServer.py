@@ -0,0 +1,483 @@
+"""
+A local server that owns one or more running simulations and streams the
+births and deaths of every generation to any number of connected clients.
+
+The server listens either on a Unix socket or on a localhost TCP port. Messages
+in both directions are JSON objects, one per line. Cell coordinates are sent as
+flat lists of world coordinates, [x0, y0, x1, y1, ...], to keep deltas compact.
+
+Commands sent by a client:
+
+    {"cmd": "list"}
+    {"cmd": "subscribe", "sim": <name>, "viewport": [xmin, xmax, ymin, ymax]}
+    {"cmd": "unsubscribe", "sim": <name>}
+    {"cmd": "snapshot", "sim": <name>, "viewport": [xmin, xmax, ymin, ymax]}
+    {"cmd": "step", "sim": <name>, "count": <n>}
+    {"cmd": "pause", "sim": <name>}
+    {"cmd": "run", "sim": <name>}
+
+The viewport is optional, if missing the whole grid is used. Messages sent by
+the server:
+
+    {"type": "list", "simulations": [{"name", "generation", "paused",
+                                      "bounds"}, ...]}
+    {"type": "snapshot", "sim", "generation", "bounds", "cells"}
+    {"type": "delta", "sim", "generation", "births", "deaths"}
+    {"type": "error", "message"}
+
+Subscribing sends a snapshot first, followed by a delta for every new
+generation. Steps are carried out by the simulation's own thread, after the
+step command has returned, and pausing cancels any steps not carried out yet.
+
+usage: <address> <cell file> [<cell file> ...]
+
+The address is either a port number, <host>:<port>, or a path to a Unix socket.
+Clients aren't authenticated, so the host must be localhost or 127.0.0.1.
+
+"""
+
+import json
+import os
+import Queue
+import socket
+import SocketServer
+import stat
+import sys
+import threading
+import time
+
+import numpy
+
+import CellFile
+from CellGrid import CellGrid
+
+
+# seconds to wait between generations of a running simulation
+defaultDelay = 0.1
+
+# messages that can be waiting to be sent to a client. A client that falls
+# further behind has its waiting messages thrown away, and gets new snapshots
+# of the simulations it watches instead.
+outboxSize = 256
+
+# queued in place of the thrown away messages of a client that fell behind
+resyncMarker = object()
+
+# hosts a TCP server may listen on. Anyone who can connect can control the
+# simulations, so only connections from this machine are allowed.
+loopbackHosts = ['localhost', '127.0.0.1']
+
+
+class Simulation:
+    """A named simulation which can be stepped, paused and watched"""
+
+    def __init__(self, name, grid, delay=defaultDelay):
+
+        self.name = name
+        self.grid = grid
+        self.generation = 0
+        self.delay = delay
+        self.paused = True
+
+        # steps asked for by clients that haven't been carried out yet, and
+        # set to wake up the runner when there are new ones
+        self.pending = 0
+        self.wakeup = threading.Event()
+
+        # connections watching this simulation, mapped to their viewports
+        self.subscribers = {}
+
+        self.lock = threading.RLock()
+
+    def step(self, count=1):
+        """Advance the simulation, sending a delta to every subscriber"""
+
+        for _ in range(count):
+            with self.lock:
+                old = self.grid.field
+                self.grid = self.grid.tick()
+                self.generation += 1
+                new = self.grid.field
+
+                births = self.gridCells((new == CellGrid.alive) &
+                                        (old == CellGrid.dead))
+                deaths = self.gridCells((new == CellGrid.dead) &
+                                        (old == CellGrid.alive))
+
+                for connection, viewport in self.subscribers.items():
+                    connection.send({'type': 'delta',
+                                     'sim': self.name,
+                                     'generation': self.generation,
+                                     'births': clip(births, viewport),
+                                     'deaths': clip(deaths, viewport)})
+
+    def queueSteps(self, count):
+        """
+        Have the runner thread advance the simulation count generations, as
+        fast as it can, so a long step never ties up the caller.
+
+        """
+
+        if count < 1:
+            raise ValueError('step count must be at least 1: %i' % count)
+        with self.lock:
+            self.pending += count
+        self.wakeup.set()
+
+    def pause(self):
+        """Stop running, and cancel any steps that haven't been carried out"""
+
+        with self.lock:
+            self.paused = True
+            self.pending = 0
+
+    def resume(self):
+        self.paused = False
+        self.wakeup.set()
+
+    def run(self):
+        """
+        Keep stepping the simulation for as long as it isn't paused, or while
+        there are steps queued.
+
+        """
+
+        while True:
+            with self.lock:
+                queued = self.pending > 0
+                if queued:
+                    self.pending -= 1
+
+            if queued or not self.paused:
+                self.step()
+
+            if queued:
+                # let other threads waiting on the lock go first
+                time.sleep(0)
+            else:
+                self.wakeup.wait(self.delay)
+                self.wakeup.clear()
+
+    def gridCells(self, mask):
+        """
+        Given a boolean array the shape of the field, return the world
+        coordinates of the cells that are set as an array of (col, row) rows.
+
+        """
+
+        return numpy.argwhere(mask) + (self.grid.xmin, self.grid.ymin)
+
+    def bounds(self):
+        grid = self.grid
+        return [grid.xmin, grid.xmax, grid.ymin, grid.ymax]
+
+    def snapshot(self, viewport=None):
+        """Return a message containing every live cell within the viewport"""
+
+        with self.lock:
+            cells = self.gridCells(self.grid.field == CellGrid.alive)
+            return {'type': 'snapshot',
+                    'sim': self.name,
+                    'generation': self.generation,
+                    'bounds': self.bounds(),
+                    'cells': clip(cells, viewport)}
+
+    def subscribe(self, connection, viewport=None):
+        """Send a snapshot to the connection, then keep sending it deltas"""
+
+        with self.lock:
+            connection.send(self.snapshot(viewport))
+            self.subscribers[connection] = viewport
+
+    def unsubscribe(self, connection):
+        with self.lock:
+            self.subscribers.pop(connection, None)
+
+    def describe(self):
+        with self.lock:
+            return {'name': self.name,
+                    'generation': self.generation,
+                    'paused': self.paused,
+                    'bounds': self.bounds()}
+
+
+def clip(cells, viewport):
+    """
+    Given an array of cell coordinates and a viewport with format (<xmin>,
+    <xmax>, <ymin>, <ymax>), return the cells inside the viewport as a flat list
+    [x0, y0, x1, y1, ...].
+
+    """
+
+    if viewport is not None:
+        xmin, xmax, ymin, ymax = viewport
+        inside = ((cells[:, 0] >= xmin) & (cells[:, 0] <= xmax) &
+                  (cells[:, 1] >= ymin) & (cells[:, 1] <= ymax))
+        cells = cells[inside]
+
+    return cells.ravel().tolist()
+
+
+class SimulationHandler(SocketServer.StreamRequestHandler):
+    """Handles the commands of a single client connection"""
+
+    def setup(self):
+        SocketServer.StreamRequestHandler.setup(self)
+
+        # messages are queued and written by their own thread, so a slow
+        # client never holds up a simulation
+        self.outbox = Queue.Queue(outboxSize)
+        self.sendLock = threading.Lock()
+        self.lagging = False
+        self.writer = threading.Thread(target=self.writeMessages)
+        self.writer.daemon = True
+        self.writer.start()
+
+    def handle(self):
+        for line in self.rfile:
+            line = line.strip()
+            if line == '':
+                continue
+
+            try:
+                self.dispatch(json.loads(line))
+            except (ValueError, KeyError, TypeError), e:
+                self.send({'type': 'error', 'message': str(e)})
+
+    def finish(self):
+        for sim in self.server.simulations.values():
+            sim.unsubscribe(self)
+
+        # the writer may have stopped already, so make room to tell it to stop
+        with self.sendLock:
+            self.lagging = True
+            self.drain()
+            self.outbox.put_nowait(None)
+        self.writer.join()
+        SocketServer.StreamRequestHandler.finish(self)
+
+    def dispatch(self, message):
+        """Carry out a single command from the client"""
+
+        cmd = message['cmd']
+        if cmd == 'list':
+            sims = self.server.simulations.values()
+            self.send({'type': 'list',
+                       'simulations': [sim.describe() for sim in sims]})
+            return
+
+        if message['sim'] not in self.server.simulations:
+            raise ValueError('unknown simulation: %s' % message['sim'])
+        sim = self.server.simulations[message['sim']]
+
+        if cmd == 'subscribe':
+            sim.subscribe(self, message.get('viewport'))
+        elif cmd == 'unsubscribe':
+            sim.unsubscribe(self)
+        elif cmd == 'snapshot':
+            self.send(sim.snapshot(message.get('viewport')))
+        elif cmd == 'step':
+            sim.queueSteps(int(message.get('count', 1)))
+        elif cmd == 'pause':
+            sim.pause()
+        elif cmd == 'run':
+            sim.resume()
+        else:
+            raise ValueError('unknown command: %s' % cmd)
+
+    def send(self, message):
+        """
+        Queue a message to be sent to the client. Never blocks, if the client
+        is too far behind its waiting messages are replaced by new snapshots.
+
+        """
+
+        with self.sendLock:
+            if self.lagging:
+                return
+
+            try:
+                self.outbox.put_nowait(message)
+            except Queue.Full:
+                self.lagging = True
+                self.drain()
+                self.outbox.put_nowait(resyncMarker)
+
+    def drain(self):
+        """Throw away every message waiting to be sent"""
+
+        while True:
+            try:
+                self.outbox.get_nowait()
+            except Queue.Empty:
+                return
+
+    def resync(self):
+        """Send new snapshots of every simulation the client watches"""
+
+        with self.sendLock:
+            self.lagging = False
+
+        for sim in self.server.simulations.values():
+            with sim.lock:
+                if self in sim.subscribers:
+                    sim.subscribe(self, sim.subscribers[self])
+
+    def writeMessages(self):
+        while True:
+            message = self.outbox.get()
+            if message is None:
+                break
+            if message is resyncMarker:
+                self.resync()
+                continue
+
+            try:
+                self.wfile.write(json.dumps(message, separators=(',', ':')))
+                self.wfile.write('\n')
+                self.wfile.flush()
+            except socket.error:
+                break
+
+
+class TCPSimulationServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class UnixSimulationServer(SocketServer.ThreadingMixIn,
+                           SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+
+def parseAddress(address):
+    """
+    Given an address string, return either a (host, port) tuple or the path to
+    a Unix socket. Plain port numbers are bound to 127.0.0.1, and any other
+    host than localhost is refused.
+
+    """
+
+    if address.isdigit():
+        return ('127.0.0.1', int(address))
+    if ':' in address:
+        host, port = address.rsplit(':', 1)
+        if host not in loopbackHosts:
+            raise ValueError('only localhost addresses are allowed: %s' %
+                             address)
+        return (host, int(port))
+    return address
+
+
+def removeStaleSocket(path):
+    """
+    Remove a Unix socket left behind by an earlier server, so the path can be
+    bound again. Anything else at the path is left alone.
+
+    """
+
+    if not os.path.exists(path):
+        return
+    if not stat.S_ISSOCK(os.stat(path).st_mode):
+        raise ValueError('not a Unix socket, refusing to replace it: %s' % path)
+    os.remove(path)
+
+def createServer(address, simulations):
+    """
+    Create a server listening on the given address that owns the given list of
+    simulations. Each simulation gets a thread which steps it while it's
+    running.
+
+    """
+
+    address = parseAddress(address)
+    if isinstance(address, tuple):
+        server = TCPSimulationServer(address, SimulationHandler)
+    else:
+        removeStaleSocket(address)
+        server = UnixSimulationServer(address, SimulationHandler)
+
+    server.simulations = {}
+    for sim in simulations:
+        server.simulations[sim.name] = sim
+        runner = threading.Thread(target=sim.run)
+        runner.daemon = True
+        runner.start()
+
+    return server
+
+
+class SimulationClient:
+    """
+    A blocking client for scripts that want to drive or watch simulations
+    owned by a server.
+
+    """
+
+    def __init__(self, address):
+
+        address = parseAddress(address)
+        if isinstance(address, tuple):
+            self.sock = socket.create_connection(address)
+        else:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(address)
+        self.rfile = self.sock.makefile('r')
+
+    def send(self, cmd, **kwargs):
+        """Send a command, any keyword arguments are added to the message"""
+
+        kwargs['cmd'] = cmd
+        self.sock.sendall(json.dumps(kwargs) + '\n')
+
+    def receive(self):
+        """Wait for the next message from the server. Returns None when the
+        connection is closed.
+
+        """
+
+        line = self.rfile.readline()
+        if line == '':
+            return None
+        return json.loads(line)
+
+    def messages(self):
+        """Iterate over messages from the server until the connection closes"""
+
+        while True:
+            message = self.receive()
+            if message is None:
+                return
+            yield message
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+
+def pairs(cells):
+    """Turn a flat list [x0, y0, x1, y1, ...] into a list of (x, y) tuples"""
+
+    return zip(cells[0::2], cells[1::2])
+
+
+def loadSimulation(filename):
+    """Load a cell file as a paused simulation named after the file"""
+
+    grid = CellFile.load(filename)
+    name = os.path.splitext(os.path.basename(filename))[0]
+    return Simulation(name, grid)
+
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print 'usage: <address> <cell file> [<cell file> ...]'
+    else:
+        simulations = [loadSimulation(f) for f in sys.argv[2:]]
+        server = createServer(sys.argv[1], simulations)
+        print 'serving', ', '.join(sim.name for sim in simulations)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,99 @@
+"""
+A compact record of every generation of a grid, so any earlier generation can
+be brought back.
+
+Rather than keeping a whole field per generation, each generation is stored as
+the positions of the cells that changed since the generation before it, which
+is the XOR of the two fields. Every so often a keyframe, a whole field packed
+to one bit per cell and compressed, is stored as well. A generation is rebuilt
+from the nearest keyframe before it by flipping the changed cells of each
+generation in between, so it never takes more than keyframeInterval steps.
+
+"""
+
+import zlib
+
+import numpy
+
+from CellGrid import CellGrid, measure
+
+
+class Timeline:
+    """The generations of a grid, as sparse XOR deltas and keyframes"""
+
+    def __init__(self, grid, keyframeInterval=64):
+        """
+        grid is generation 0. A keyframe is stored every keyframeInterval
+        generations.
+
+        """
+
+        self.bounds = (grid.xmin, grid.xmax, grid.ymin, grid.ymax)
+        self.rule = grid.rule
+        self.shape = grid.field.shape
+        self.keyframeInterval = keyframeInterval
+
+        # keyframes keyed by generation, and for every generation the flat
+        # positions of the cells that changed. Generation 0 has no changes.
+        self.keyframes = {}
+        self.deltas = [numpy.zeros(0, dtype='int32')]
+
+        # the field of the last generation, to work out the next delta
+        self.last = grid.field.copy()
+        self.keyframes[0] = self.compress(self.last)
+
+    def __len__(self):
+        """Return the number of generations recorded"""
+        return len(self.deltas)
+
+    def append(self, grid):
+        """Record the generation after the last one"""
+
+        changed = numpy.flatnonzero(self.last != grid.field)
+        self.deltas.append(changed.astype('int32'))
+        self.last[...] = grid.field
+
+        generation = len(self.deltas) - 1
+        if generation % self.keyframeInterval == 0:
+            self.keyframes[generation] = self.compress(self.last)
+
+    def compress(self, field):
+        """Pack a field to one bit per cell, and compress it"""
+        return zlib.compress(numpy.packbits(field.ravel() != 0).tobytes())
+
+    def decompress(self, keyframe):
+        """Turn a keyframe back into a field"""
+
+        bits = numpy.frombuffer(zlib.decompress(keyframe), dtype='uint8')
+        cells = numpy.unpackbits(bits)[:numpy.prod(self.shape)]
+        return cells.reshape(self.shape).astype('int')
+
+    def getGrid(self, generation):
+        """Rebuild a recorded generation, returns a CellGrid"""
+
+        if generation < 0 or generation >= len(self.deltas):
+            raise IndexError('generation %i was not recorded' % generation)
+
+        start = generation - generation % self.keyframeInterval
+        field = self.decompress(self.keyframes[start])
+        flat = field.reshape(-1)
+        for delta in self.deltas[start + 1:generation + 1]:
+            flat[delta] ^= CellGrid.alive
+
+        grid = CellGrid(self.bounds, rule=self.rule)
+        grid.field = field
+
+        # flip the last changes back to get the metrics of this generation
+        if generation > 0:
+            previous = field.copy()
+            previous.reshape(-1)[self.deltas[generation]] ^= CellGrid.alive
+            grid.metrics = measure(previous, field, grid.xmin, grid.ymin)
+
+        return grid
+
+    def nbytes(self):
+        """Return the number of bytes used by the deltas and keyframes"""
+
+        total = sum(delta.nbytes for delta in self.deltas)
+        total += sum(len(keyframe) for keyframe in self.keyframes.values())
+        return total
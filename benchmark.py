@@ -0,0 +1,180 @@
+"""
+Benchmarks for the different ways of advancing a grid of cells.
+
+If executed, times the per-cell CellGrid.tick() against the BlockEngine on the
+given cell file, or on a random grid if no file is given, and checks that both
+produce the same generations. With --nd, times NDCellGrid.tick() on a random
+cube of the given size instead. With --imports, times a cold import of each
+entry point in a fresh interpreter, and checks that the command line and the
+library don't load the GUI.
+
+usage: [<cell file> [<num generations>]]
+       --nd [<size> [<num generations>]]
+       --imports
+
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+import numpy
+
+from BlockEngine import BlockEngine, loadTable
+import CellFile
+from CellGrid import CellGrid
+from NDCellGrid import NDCellGrid
+
+
+# modules to time importing, and whether they may load the GUI
+entryPoints = [
+    ('CellGrid', False),
+    ('gameoflife', False),
+    ('CellFile', False),
+    ('SimulationServer', False),
+    ('CellGridViewer', True),
+]
+
+# top level packages that only the viewer should need
+guiPackages = ['PyQt4', 'OpenGL']
+
+# run in a fresh interpreter, prints the import time and the GUI packages
+# that got loaded
+importScript = '''
+import sys, time
+start = time.time()
+import %s
+print time.time() - start
+print ' '.join(p for p in %r if p in sys.modules)
+'''
+
+
+def randomGrid(ncols, nrows, density=0.3, seed=0):
+    """Return a CellGrid of the given size with randomly placed live cells"""
+
+    grid = CellGrid((0, ncols - 1, 0, nrows - 1))
+    random = numpy.random.RandomState(seed)
+    grid.field[...] = random.random_sample((ncols, nrows)) < density
+    return grid
+
+def timeIt(func, num_generations):
+    """Call func the given number of times, return the seconds per call"""
+
+    start = time.time()
+    for _ in range(num_generations):
+        func()
+    return (time.time() - start) / num_generations
+
+def benchBlockEngine(grid, num_generations):
+    """Compare CellGrid.tick() to BlockEngine.tick() on the given grid"""
+
+    # make sure building or loading the table isn't part of the timing
+    start = time.time()
+    loadTable(grid.rule)
+    print 'table for %s: %.3f s' % (grid.rule, time.time() - start)
+
+    state = {'grid': grid}
+    def tick():
+        state['grid'] = state['grid'].tick()
+    percell = timeIt(tick, num_generations)
+
+    engine = BlockEngine(grid)
+    block = timeIt(engine.tick, num_generations)
+
+    same = (engine.getGrid().field == state['grid'].field).all()
+
+    print '%i x %i cells, %i generations' % (grid.ncols, grid.nrows,
+                                             num_generations)
+    print '  CellGrid.tick:    %10.6f s per generation' % percell
+    print '  BlockEngine.tick: %10.6f s per generation' % block
+    print '  speedup: %.1fx, same result: %s' % (percell / block, same)
+
+def benchNDCellGrid(size, num_generations, rule='4555'):
+    """Time NDCellGrid.tick() on a random 3D cube of size^3 cells"""
+
+    grid = NDCellGrid((0, size - 1) * 3, rule=rule)
+    random = numpy.random.RandomState(0)
+    grid.field[...] = random.random_sample(grid.shape) < 0.2
+
+    state = {'grid': grid}
+    def tick():
+        state['grid'] = state['grid'].tick()
+    seconds = timeIt(tick, num_generations)
+
+    print '%i^3 cells, rule %s, %i generations' % (size, rule,
+                                                   num_generations)
+    print '  NDCellGrid.tick: %10.6f s per generation' % seconds
+    print '  field: %.1f MB' % (grid.field.nbytes / 1e6)
+
+def benchImports(repeat=5):
+    """
+    Time a cold import of every entry point, best of repeat fresh
+    interpreters. Returns False if a headless entry point loaded the GUI or
+    failed to import.
+
+    """
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+    ok = True
+    for module, gui in entryPoints:
+        best = None
+        err = ''
+        for _ in range(repeat):
+            script = importScript % (module, guiPackages)
+            process = subprocess.Popen([sys.executable, '-c', script],
+                                       cwd=directory, stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE)
+            out, err = process.communicate()
+            if process.returncode != 0:
+                break
+            lines = out.split('\n')
+            seconds = float(lines[0])
+            if best is None or seconds < best:
+                best = seconds
+            loaded = lines[1].strip()
+
+        if best is None:
+            print '  %-18s could not be imported' % module
+            if gui:
+                # the GUI packages may just not be installed here
+                continue
+            print err
+            ok = False
+            continue
+
+        print '  %-18s %8.4f s  %s' % (module, best, loaded)
+        if loaded and not gui:
+            print '    loads %s, but should not need the GUI' % loaded
+            ok = False
+
+    return ok
+
+
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 2 and sys.argv[1] == '--nd':
+        size = 256
+        if len(sys.argv) >= 3:
+            size = int(sys.argv[2])
+        num_generations = 3
+        if len(sys.argv) >= 4:
+            num_generations = int(sys.argv[3])
+        benchNDCellGrid(size, num_generations)
+        sys.exit()
+
+    if len(sys.argv) >= 2 and sys.argv[1] == '--imports':
+        if not benchImports():
+            sys.exit(1)
+        sys.exit()
+
+    if len(sys.argv) >= 2:
+        grid = CellFile.load(sys.argv[1])
+    else:
+        grid = randomGrid(128, 128)
+
+    num_generations = 10
+    if len(sys.argv) >= 3:
+        num_generations = int(sys.argv[2])
+
+    benchBlockEngine(grid, num_generations)
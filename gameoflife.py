@@ -4,41 +4,74 @@ Conway's Game of Life
 Contains logic for producing the next generation.
 
 If executed, will take an initial input file, and output a text file for each
-new generation.
+new generation. If a stats file is given, the population, births, deaths,
+bounding box and active area of every generation are written to it, as CSV
+for a .csv file or as numpy columns for a .npz file.
 
-usage: <input file> <num generations> <output>
+With --nd, the input file is loaded as an n-dimensional cell file, such as a
+3D grid, see NDCellFile. A stats file isn't supported with --nd.
+
+usage: <input file> <num generations> <output> [<stats file>]
+       --nd <input file> <num generations> <output>
 
 """
 
-import numpy
 import os
 import sys
 
-from CellGrid import CellGrid
+import CellFile
+from GenerationStats import GenerationStats
 import MCellFile
 
 
 
-def main(input, num_generations, output_template):
+def main(input, num_generations, output_template, stats_output=None):
+
+    grid = CellFile.load(input)
+    stats = GenerationStats(num_generations + 1)
+
+    # check the stats file type before writing any generations
+    if stats_output is not None:
+        writeStats = stats.getWriter(stats_output)
+
+    generations = ((generation.generation, generation) for generation in
+                   grid.generations(stop=num_generations + 1))
+    for gen_num, generation in writeGenerations(generations, MCellFile.write,
+                                                output_template):
+        stats.record(gen_num, generation.metrics)
+
+    if stats_output is not None:
+        writeStats(stats_output)
+        print 'outputted', stats_output
+
+def mainND(input, num_generations, output_template):
+
+    # only needed for n-dimensional files, so imported here
+    import NDCellFile
 
-    grid = MCellFile.load(input)
+    grid = NDCellFile.load(input)
 
-    for gen_num in range(num_generations):
+    generations = enumerate(grid.generations(stop=num_generations + 1))
+    for _ in writeGenerations(generations, NDCellFile.write, output_template):
+        pass
+
+def writeGenerations(generations, write, output_template):
+    """
+    Given (<generation number>, <grid>) pairs, write each grid to its own
+    output file with the given write function, and yield the pair again.
+
+    """
+
+    for gen_num, grid in generations:
 
         # figure out filename for output of this generation
         output = getOutputFilename(output_template, gen_num)
 
         # write current grid to a file
-        MCellFile.write(grid, output)
+        write(grid, output)
         print 'outputted', output
 
-        # generate the next generation
-        grid = grid.tick()
-
-    # write last grid to a file
-    output = getOutputFilename(output_template, num_generations)
-    MCellFile.write(grid, output)
-    print 'outputted', output
+        yield gen_num, grid
 
 def getOutputFilename(template, gen_num):
     """
@@ -51,16 +84,30 @@ def getOutputFilename(template, gen_num):
 
     return filename + '.' + str(gen_num) + ext
 
+def printUsage():
+    """Print the command line usage"""
+    print 'usage: <input file> <num generations> <output> [<stats file>]'
+    print '       --nd <input file> <num generations> <output>'
+    print '       (a stats file is not supported with --nd)'
+
 
 
 if __name__ == '__main__':
-    if len(sys.argv) < 4:
-        print 'usage: <input file> <num generations> <output>'
+    if len(sys.argv) >= 2 and sys.argv[1] == '--nd':
+        if len(sys.argv) != 5:
+            printUsage()
+        else:
+            mainND(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+    elif len(sys.argv) < 4:
+        printUsage()
     else:
         input = sys.argv[1]
         num_generations = int(sys.argv[2])
         output = sys.argv[3]
-        main(input, num_generations, output)
+        stats_output = None
+        if len(sys.argv) >= 5:
+            stats_output = sys.argv[4]
+        main(input, num_generations, output, stats_output)
 
 
 